@@ -1,20 +1,25 @@
 from typing import List, Dict, Optional
 from pathlib import Path
 import os
-from firecrawl import FirecrawlApp
-from qdrant_client import QdrantClient
+import httpx
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http import models
 from qdrant_client.http.models import Distance, VectorParams
 from fastembed import TextEmbedding
-from agents import Agent, Runner
-from openai import AsyncOpenAI
-import tempfile
+import numpy as np
+from agents import Agent, Runner, RunConfig, OpenAIProvider
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from pydantic import BaseModel
+import io
 import uuid
-from datetime import datetime
-import time
+import hashlib
+import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import streamlit as st
 from dotenv import load_dotenv
 import asyncio
+import threading
 
 load_dotenv()
 
@@ -27,11 +32,12 @@ def init_session_state():
         "openai_api_key": "",
         "doc_url": "",
         "setup_complete": False,
-        "client": None,
+        "async_client": None,
         "embedding_model": None,
-        "processor_agent": None,
-        "tts_agent": None,
-        "selected_voice": "coral"
+        "docs_agent": None,
+        "selected_voice": "coral",
+        "use_gpu": False,
+        "embedding_batch_size": 32
     }
     
     for key, value in defaults.items():
@@ -81,6 +87,25 @@ def sidebar_config():
             help="Choose the voice for the audio response"
         )
         
+        st.markdown("---")
+        st.markdown("### ⚙️ Embedding Settings")
+        st.session_state.use_gpu = st.checkbox(
+            "Use GPU for embeddings",
+            value=st.session_state.use_gpu,
+            help="Requires fastembed-gpu and a CUDA-capable GPU"
+        )
+        st.session_state.embedding_batch_size = st.number_input(
+            "Embedding batch size",
+            min_value=1,
+            max_value=256,
+            value=st.session_state.embedding_batch_size,
+            help="Lower this (e.g. 8) if the GPU runs out of memory"
+        )
+        
+        if st.button("Clear cached answers"):
+            cached_process_query.clear()
+            st.success("✅ Cached answers cleared!")
+        
         if st.button("Initialize System", type="primary"):
             if all([
                 st.session_state.qdrant_url,
@@ -93,33 +118,35 @@ def sidebar_config():
                 with progress_placeholder.container():
                     try:
                         st.markdown("🔄 Setting up Qdrant connection...")
-                        client, embedding_model = setup_qdrant_collection(
+                        async_client, embedding_model = setup_qdrant_collection(
                             st.session_state.qdrant_url,
-                            st.session_state.qdrant_api_key
+                            st.session_state.qdrant_api_key,
+                            use_gpu=st.session_state.use_gpu
                         )
-                        st.session_state.client = client
+                        st.session_state.async_client = async_client
                         st.session_state.embedding_model = embedding_model
                         st.markdown("✅ Qdrant setup complete!")
                         
                         st.markdown("🔄 Crawling documentation pages...")
-                        pages = crawl_documentation(
-                            st.session_state.firecrawl_api_key,
+                        pages = run_async(crawl_documentation_async(
+                            get_firecrawl_client(st.session_state.firecrawl_api_key),
                             st.session_state.doc_url
-                        )
+                        ))
                         st.markdown(f"✅ Crawled {len(pages)} documentation pages!")
                         
-                        store_embeddings(
-                            client,
+                        changed_pages = run_async(store_embeddings_async(
+                            async_client,
                             embedding_model,
                             pages,
-                            "docs_embeddings"
-                        )
+                            "docs_embeddings",
+                            batch_size=st.session_state.embedding_batch_size
+                        ))
+                        st.markdown(f"✅ Embedded {changed_pages} new or changed pages!")
+                        if changed_pages > 0:
+                            # Answers built from the old content are stale now
+                            cached_process_query.clear()
                         
-                        processor_agent, tts_agent = setup_agents(
-                            st.session_state.openai_api_key
-                        )
-                        st.session_state.processor_agent = processor_agent
-                        st.session_state.tts_agent = tts_agent
+                        st.session_state.docs_agent = setup_agents()
                         
                         st.session_state.setup_complete = True
                         st.success("✅ System initialized successfully!")
@@ -129,41 +156,187 @@ def sidebar_config():
             else:
                 st.error("Please fill in all the required fields!")
 
-def setup_qdrant_collection(qdrant_url: str, qdrant_api_key: str, collection_name: str = "docs_embeddings"):
-    client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
-    embedding_model = TextEmbedding()
-    test_embedding = list(embedding_model.embed(["test"]))[0]
-    embedding_dim = len(test_embedding)
+@st.cache_resource
+def get_event_loop():
+    # One long-lived loop so cached async clients keep their connection pools across reruns
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+def run_async(coro):
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+@st.cache_resource
+def get_async_openai(openai_api_key: str):
+    return AsyncOpenAI(
+        api_key=openai_api_key,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+        )
+    )
+
+@st.cache_resource
+def get_firecrawl_client(firecrawl_api_key: str):
+    return httpx.AsyncClient(
+        headers={"Authorization": f"Bearer {firecrawl_api_key}"},
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+        timeout=60.0
+    )
+
+def validate_cuda():
+    import onnxruntime
     
-    try:
+    if "CUDAExecutionProvider" not in onnxruntime.get_available_providers():
+        raise RuntimeError(
+            "CUDAExecutionProvider is not available. Install fastembed-gpu "
+            "(instead of fastembed) on a machine with CUDA, or disable GPU embeddings."
+        )
+
+@st.cache_resource
+def get_embedding_model(use_gpu: bool = False):
+    if use_gpu:
+        validate_cuda()
+        return TextEmbedding(providers=["CUDAExecutionProvider"])
+    return TextEmbedding()
+
+@st.cache_resource
+def get_qdrant_client(qdrant_url: str, qdrant_api_key: str):
+    return QdrantClient(url=qdrant_url, api_key=qdrant_api_key, prefer_grpc=True)
+
+@st.cache_resource
+def get_async_qdrant_client(qdrant_url: str, qdrant_api_key: str):
+    return AsyncQdrantClient(url=qdrant_url, api_key=qdrant_api_key, prefer_grpc=True)
+
+def get_embedding_dim(embedding_model: TextEmbedding) -> int:
+    for description in TextEmbedding.list_supported_models():
+        if description["model"] == embedding_model.model_name:
+            return description["dim"]
+    
+    # Unknown model: fall back to probing with a throwaway embedding
+    return len(list(embedding_model.embed(["test"]))[0])
+
+def setup_qdrant_collection(qdrant_url: str, qdrant_api_key: str, collection_name: str = "docs_embeddings", use_gpu: bool = False):
+    client = get_qdrant_client(qdrant_url, qdrant_api_key)
+    async_client = get_async_qdrant_client(qdrant_url, qdrant_api_key)
+    embedding_model = get_embedding_model(use_gpu)
+    embedding_dim = get_embedding_dim(embedding_model)
+    
+    if not client.collection_exists(collection_name):
         client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=embedding_dim, distance=Distance.COSINE)
+            vectors_config=VectorParams(size=embedding_dim, distance=Distance.COSINE, on_disk=True),
+            hnsw_config=models.HnswConfigDiff(m=32, ef_construct=256),
+            quantization_config=models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    always_ram=True
+                )
+            ),
+            on_disk_payload=True
+        )
+    
+    # Collections created before the url index existed get it here as well
+    if "url" not in client.get_collection(collection_name).payload_schema:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name="url",
+            field_schema=models.PayloadSchemaType.KEYWORD
         )
-    except Exception as e:
-        if "already exists" not in str(e):
-            raise e
     
-    return client, embedding_model
+    return async_client, embedding_model
+
+FIRECRAWL_API_URL = "https://api.firecrawl.dev/v1"
 
-def crawl_documentation(firecrawl_api_key: str, url: str, output_dir: Optional[str] = None):
-    firecrawl = FirecrawlApp(api_key=firecrawl_api_key)
+def retry_delay(retry_after: Optional[str], default: float) -> float:
+    # Retry-After is either delta-seconds or an HTTP-date
+    if not retry_after:
+        return default
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+async def firecrawl_request(
+    http_client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    method: str,
+    url: str,
+    max_retries: int = 5,
+    **kwargs
+) -> Dict:
+    delay = 1.0
+    for attempt in range(max_retries):
+        async with semaphore:
+            response = await http_client.request(method, url, **kwargs)
+        if response.status_code != 429 or attempt == max_retries - 1:
+            response.raise_for_status()
+            return response.json()
+        await asyncio.sleep(retry_delay(response.headers.get("Retry-After"), delay))
+        delay *= 2
+
+def write_page(filepath: str, content: str):
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+async def crawl_documentation_async(
+    http_client: httpx.AsyncClient,
+    url: str,
+    output_dir: Optional[str] = None,
+    max_concurrent_requests: int = 2,
+    poll_interval: float = 1.0,
+    max_wait: float = 600.0
+):
     pages = []
+    writes = []
+    semaphore = asyncio.Semaphore(max_concurrent_requests)
     
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
     
-    response = firecrawl.crawl_url(
-        url,
-        params={
+    crawl_job = await firecrawl_request(
+        http_client,
+        semaphore,
+        "POST",
+        f"{FIRECRAWL_API_URL}/crawl",
+        json={
+            'url': url,
             'limit': 5,
             'scrapeOptions': {
                 'formats': ['markdown', 'html']
             }
         }
     )
+    status_url = f"{FIRECRAWL_API_URL}/crawl/{crawl_job['id']}"
+    
+    deadline = asyncio.get_running_loop().time() + max_wait
+    response = await firecrawl_request(http_client, semaphore, "GET", status_url)
+    while response.get('status') not in ('completed', 'failed', 'cancelled'):
+        if asyncio.get_running_loop().time() >= deadline:
+            raise TimeoutError(
+                f"Firecrawl crawl {crawl_job['id']} still '{response.get('status')}' after {max_wait:.0f}s"
+            )
+        await asyncio.sleep(poll_interval)
+        response = await firecrawl_request(http_client, semaphore, "GET", status_url)
+    
+    if response.get('status') != 'completed':
+        raise Exception(f"Firecrawl crawl {response.get('status')}: {response.get('error', '')}")
     
     while True:
+        # Prefetch the next page of results while the current one is processed
+        next_url = response.get('next')
+        next_response = None
+        if next_url:
+            next_response = asyncio.create_task(
+                firecrawl_request(http_client, semaphore, "GET", next_url)
+            )
+        
         for page in response.get('data', []):
             content = page.get('markdown') or page.get('html', '')
             metadata = page.get('metadata', {})
@@ -172,8 +345,7 @@ def crawl_documentation(firecrawl_api_key: str, url: str, output_dir: Optional[s
             if output_dir and content:
                 filename = f"{uuid.uuid4()}.md"
                 filepath = os.path.join(output_dir, filename)
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(content)
+                writes.append(asyncio.to_thread(write_page, filepath, content))
             
             pages.append({
                 "content": content,
@@ -186,78 +358,208 @@ def crawl_documentation(firecrawl_api_key: str, url: str, output_dir: Optional[s
                 }
             })
         
-        next_url = response.get('next')
-        if not next_url:
+        if not next_response:
             break
-            
-        response = firecrawl.get(next_url)
-        time.sleep(1)
+        
+        response = await next_response
     
+    await asyncio.gather(*writes)
     return pages
 
-def store_embeddings(client: QdrantClient, embedding_model: TextEmbedding, pages: List[Dict], collection_name: str):
-    for page in pages:
-        embedding = list(embedding_model.embed([page["content"]]))[0]
-        client.upsert(
+# Qdrant server default, in KB
+DEFAULT_INDEXING_THRESHOLD = 10000
+
+def point_id(url: str, chunk_index: int) -> int:
+    # Stable unsigned 64-bit id, so re-ingesting a page overwrites its previous points
+    digest = hashlib.sha256(f"{url}#{chunk_index}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+def chunk_text(text: str, size: int = 300, overlap: int = 30) -> List[str]:
+    # Sizes are in words; 300 words is roughly 400 tokens, under the 512-token model limit
+    # Slice the original text by word offsets so code blocks and lists keep their formatting
+    words = list(re.finditer(r"\S+", text))
+    if not words:
+        return []
+    
+    step = size - overlap
+    return [
+        text[words[i].start():words[min(i + size, len(words)) - 1].end()]
+        for i in range(0, max(len(words) - overlap, 1), step)
+    ]
+
+async def store_embeddings_async(
+    async_client: AsyncQdrantClient,
+    embedding_model: TextEmbedding,
+    pages: List[Dict],
+    collection_name: str,
+    concurrency: int = 4,
+    batch_size: int = 32,
+    upload_batch_size: int = 64
+) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def stored_hash(url: str) -> Optional[str]:
+        async with semaphore:
+            records, _ = await async_client.scroll(
+                collection_name=collection_name,
+                scroll_filter=models.Filter(
+                    must=[models.FieldCondition(key="url", match=models.MatchValue(value=url))]
+                ),
+                with_payload=["content_sha256"],
+                limit=1
+            )
+        return records[0].payload.get("content_sha256") if records else None
+    
+    content_hashes = [hashlib.sha256(page["content"].encode()).hexdigest() for page in pages]
+    stored_hashes = await asyncio.gather(*[stored_hash(page["url"]) for page in pages])
+    
+    page_chunks = [chunk_text(page["content"]) for page in pages]
+    
+    # Only re-embed pages that are new or whose content changed since the last ingest.
+    # Empty pages produce no points, so they would otherwise look changed on every run.
+    changed = [
+        i for i, (new, old) in enumerate(zip(content_hashes, stored_hashes))
+        if new != old and page_chunks[i]
+    ]
+    # Delete by url for every changed page, including points written without a content_sha256
+    stale_urls = [pages[i]["url"] for i in changed]
+    
+    async def delete_pages(urls: List[str]):
+        await async_client.delete(
             collection_name=collection_name,
-            points=[
-                models.PointStruct(
-                    id=str(uuid.uuid4()),
-                    vector=embedding.tolist(),
-                    payload={
-                        "content": page["content"],
-                        "url": page["url"],
-                        **page["metadata"]
-                    }
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[models.FieldCondition(key="url", match=models.MatchAny(any=urls))]
                 )
-            ]
+            ),
+            wait=True
+        )
+    
+    if not stale_urls:
+        return 0
+    
+    await delete_pages(stale_urls)
+    
+    chunks = []
+    chunk_meta = []
+    for page_index in changed:
+        for chunk_index, chunk in enumerate(page_chunks[page_index]):
+            chunks.append(chunk)
+            chunk_meta.append((page_index, chunk_index))
+    
+    # Embed in length-sorted order so each batch pads to a similar length,
+    # then scatter the vectors back to their original positions
+    order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]))
+    sorted_chunks = [chunks[i] for i in order]
+    
+    # Embedding is CPU-bound; run it in a worker thread so the shared event loop stays free
+    sorted_embeddings = await asyncio.to_thread(
+        lambda: list(embedding_model.embed(sorted_chunks, batch_size=batch_size))
+    )
+    
+    vectors = np.empty((len(chunks), len(sorted_embeddings[0])), dtype=np.float32)
+    for position, embedding in enumerate(sorted_embeddings):
+        vectors[order[position]] = embedding
+    
+    ids = [point_id(pages[page_index]["url"], chunk_index) for page_index, chunk_index in chunk_meta]
+    payloads = [
+        {
+            "content": chunk,
+            "url": pages[page_index]["url"],
+            "chunk_index": chunk_index,
+            "content_sha256": content_hashes[page_index],
+            **pages[page_index]["metadata"]
+        }
+        for chunk, (page_index, chunk_index) in zip(chunks, chunk_meta)
+    ]
+    
+    async def send(start: int):
+        end = start + upload_batch_size
+        async with semaphore:
+            await async_client.upsert(
+                collection_name=collection_name,
+                points=models.Batch(
+                    ids=ids[start:end],
+                    vectors=vectors[start:end].tolist(),
+                    payloads=payloads[start:end]
+                ),
+                wait=False
+            )
+    
+    # Pause HNSW indexing during the bulk load and restore the collection's own threshold at the end
+    collection_info = await async_client.get_collection(collection_name)
+    indexing_threshold = collection_info.config.optimizer_config.indexing_threshold
+    # 0 means indexing is disabled, e.g. left paused by a concurrent or crashed ingest; never restore it
+    if not indexing_threshold:
+        indexing_threshold = DEFAULT_INDEXING_THRESHOLD
+    
+    await async_client.update_collection(
+        collection_name=collection_name,
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0)
+    )
+    try:
+        # Let every batch settle before checking, so none can commit after the rollback below
+        results = await asyncio.gather(
+            *[send(start) for start in range(0, len(chunks), upload_batch_size)],
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # Drop the partially written pages so their hash doesn't mark them as up to date
+            await delete_pages(stale_urls)
+            raise errors[0]
+    finally:
+        await async_client.update_collection(
+            collection_name=collection_name,
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=indexing_threshold)
         )
-
-def setup_agents(openai_api_key: str):
-    os.environ["OPENAI_API_KEY"] = openai_api_key
     
-    processor_agent = Agent(
-        name="Documentation Processor",
-        instructions="""You are a helpful documentation assistant. Your task is to:
+    return len(changed)
+
+class SpokenAnswer(BaseModel):
+    spoken_text: str
+    tts_instructions: str
+
+@st.cache_resource
+def setup_agents():
+    docs_agent = Agent(
+        name="Documentation Voice Assistant",
+        instructions="""You are a helpful documentation assistant whose answers are read aloud. Your task is to:
         1. Analyze the provided documentation content
         2. Answer the user's question clearly and concisely
         3. Include relevant examples when available
         4. Cite the source URLs when referencing specific content
         5. Keep responses natural and conversational
-        6. Format your response in a way that's easy to speak out loud""",
-        model="gpt-4o"
-    )
-
-    tts_agent = Agent(
-        name="Text-to-Speech Agent",
-        instructions="""You are a text-to-speech agent. Your task is to:
-        1. Convert the processed documentation response into natural speech
-        2. Maintain proper pacing and emphasis
-        3. Handle technical terms clearly
-        4. Keep the tone professional but friendly
-        5. Use appropriate pauses for better comprehension
-        6. Ensure the speech is clear and well-articulated""",
-        model="gpt-4o-mini-tts"
+        6. Format your response in a way that's easy to speak out loud
+        
+        Return the answer as spoken_text, and in tts_instructions describe how a
+        text-to-speech voice should deliver it: pacing, emphasis, how to handle
+        technical terms, where to pause, and a professional but friendly tone.""",
+        model="gpt-4o",
+        output_type=SpokenAnswer
     )
     
-    return processor_agent, tts_agent
+    return docs_agent
 
 async def process_query(
     query: str,
-    client: QdrantClient,
+    async_client: AsyncQdrantClient,
     embedding_model: TextEmbedding,
-    processor_agent: Agent,
-    tts_agent: Agent,
+    docs_agent: Agent,
     collection_name: str,
-    openai_api_key: str
+    async_openai: AsyncOpenAI,
+    voice: str
 ):
     try:
-        query_embedding = list(embedding_model.embed([query]))[0]
-        search_response = client.query_points(
+        # Embedding is CPU-bound, so keep it off the event loop
+        query_embedding = await asyncio.to_thread(
+            lambda: list(embedding_model.embed([query]))[0]
+        )
+        search_response = await async_client.query_points(
             collection_name=collection_name,
-            query=query_embedding.tolist(),
+            query=query_embedding,
             limit=3,
-            with_payload=True
+            with_payload=models.PayloadSelectorInclude(include=["url", "content"])
         )
         
         search_results = search_response.points if hasattr(search_response, 'points') else []
@@ -277,32 +579,34 @@ async def process_query(
         context += f"\nUser Question: {query}\n\n"
         context += "Please provide a clear, concise answer that can be easily spoken out loud."
         
-        processor_result = await Runner.run(processor_agent, context)
-        processor_response = processor_result.final_output
-        
-        tts_result = await Runner.run(tts_agent, processor_response)
-        tts_response = tts_result.final_output
+        # Route the agent through this session's client instead of a process-wide OPENAI_API_KEY.
+        # Trace export would need that global key, so tracing is disabled explicitly.
+        docs_result = await Runner.run(
+            docs_agent,
+            context,
+            run_config=RunConfig(
+                model_provider=OpenAIProvider(openai_client=async_openai),
+                tracing_disabled=True
+            )
+        )
+        answer = docs_result.final_output_as(SpokenAnswer)
         
-        async_openai = AsyncOpenAI(api_key=openai_api_key)
-        audio_response = await async_openai.audio.speech.create(
+        audio_buffer = io.BytesIO()
+        async with async_openai.audio.speech.with_streaming_response.create(
             model="gpt-4o-mini-tts",
-            voice=st.session_state.selected_voice,
-            input=processor_response,
-            instructions=tts_response,
+            voice=voice,
+            input=answer.spoken_text,
+            instructions=answer.tts_instructions,
             response_format="mp3"
-        )
-        
-        temp_dir = tempfile.gettempdir()
-        audio_path = os.path.join(temp_dir, f"response_{uuid.uuid4()}.mp3")
-        
-        with open(audio_path, "wb") as f:
-            f.write(audio_response.content)
+        ) as audio_response:
+            async for chunk in audio_response.iter_bytes():
+                audio_buffer.write(chunk)
                 
         return {
             "status": "success",
-            "text_response": processor_response,
-            "tts_instructions": tts_response,
-            "audio_path": audio_path,
+            "text_response": answer.spoken_text,
+            "tts_instructions": answer.tts_instructions,
+            "audio_bytes": audio_buffer.getvalue(),
             "sources": [r.payload.get("url", "Unknown URL") for r in search_results if r.payload],
             "query_details": {
                 "vector_size": len(query_embedding),
@@ -318,6 +622,26 @@ async def process_query(
             "query": query
         }
 
+# Each entry holds the full MP3 bytes, so keep the LRU small to bound memory
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=32)
+def cached_process_query(query: str, voice: str, collection_name: str, doc_url: str):
+    # Unhashable clients and agents come from the session; doc_url only keys the cache
+    result = run_async(process_query(
+        query,
+        st.session_state.async_client,
+        st.session_state.embedding_model,
+        st.session_state.docs_agent,
+        collection_name,
+        get_async_openai(st.session_state.openai_api_key),
+        voice
+    ))
+    
+    # Raising keeps failed queries out of the cache
+    if result["status"] != "success":
+        raise Exception(result.get('error', 'Unknown error occurred'))
+    
+    return result
+
 def run_streamlit():
     st.set_page_config(
         page_title="Customer Support Voice Agent",
@@ -346,42 +670,33 @@ def run_streamlit():
         with st.status("Processing your query...", expanded=True) as status:
             try:
                 st.markdown("🔄 Searching documentation and generating response...")
-                result = asyncio.run(process_query(
+                result = cached_process_query(
                     query,
-                    st.session_state.client,
-                    st.session_state.embedding_model,
-                    st.session_state.processor_agent,
-                    st.session_state.tts_agent,
+                    st.session_state.selected_voice,
                     "docs_embeddings",
-                    st.session_state.openai_api_key
-                ))
+                    st.session_state.doc_url
+                )
                 
-                if result["status"] == "success":
-                    status.update(label="✅ Query processed!", state="complete")
-                    
-                    st.markdown("### Response:")
-                    st.write(result["text_response"])
-                    
-                    if "audio_path" in result:
-                        st.markdown(f"### 🔊 Audio Response (Voice: {st.session_state.selected_voice})")
-                        st.audio(result["audio_path"], format="audio/mp3", start_time=0)
-                        
-                        with open(result["audio_path"], "rb") as audio_file:
-                            audio_bytes = audio_file.read()
-                            st.download_button(
-                                label="📥 Download Audio Response",
-                                data=audio_bytes,
-                                file_name=f"voice_response_{st.session_state.selected_voice}.mp3",
-                                mime="audio/mp3"
-                            )
-                    
-                    st.markdown("### Sources:")
-                    for source in result["sources"]:
-                        st.markdown(f"- {source}")
-                else:
-                    status.update(label="❌ Error processing query", state="error")
-                    st.error(f"Error: {result.get('error', 'Unknown error occurred')}")
+                status.update(label="✅ Query processed!", state="complete")
+                
+                st.markdown("### Response:")
+                st.write(result["text_response"])
+                
+                if "audio_bytes" in result:
+                    st.markdown(f"### 🔊 Audio Response (Voice: {st.session_state.selected_voice})")
+                    st.audio(result["audio_bytes"], format="audio/mp3", start_time=0)
                     
+                    st.download_button(
+                        label="📥 Download Audio Response",
+                        data=result["audio_bytes"],
+                        file_name=f"voice_response_{st.session_state.selected_voice}.mp3",
+                        mime="audio/mp3"
+                    )
+                
+                st.markdown("### Sources:")
+                for source in result["sources"]:
+                    st.markdown(f"- {source}")
+                
             except Exception as e:
                 status.update(label="❌ Error processing query", state="error")
                 st.error(f"Error processing query: {str(e)}")